@@ -0,0 +1,141 @@
+"""
+Contention benchmark: many certbot processes adding values to the same ``_acme-challenge`` rrset.
+
+Runs the writers against a local mock of the G-Core DNS API, once without and once with
+``--dns-gcore-lock-dir`` coordination, and reports API round trips, 409 conflicts and lost values.
+
+    pip install -e .
+    python benchmarks/contention.py --processes 32 --latency 0.02
+"""
+
+import argparse
+import collections
+import http.server
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+
+from certbot_dns_gcore.dns_gcore import _GCoreClient
+
+ZONE = 'example.com'
+RECORD_NAME = '_acme-challenge.example.com'
+
+
+class MockDnsApi(http.server.ThreadingHTTPServer):
+    """In-memory G-Core DNS API supporting zone listing and rrset CRUD."""
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.latency = latency
+        self.rrsets = {}
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    server: MockDnsApi
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        if self.path.startswith('/dns/v2/zones?'):
+            self._reply('GET', 200, {'zones': [{'name': ZONE}]})
+            return
+        rrset = self.server.rrsets.get(self._key())
+        self._reply('GET', 200 if rrset else 404, rrset or {})
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        body = self._body()
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            exists = self._key() in self.server.rrsets
+            if not exists:
+                self.server.rrsets[self._key()] = body
+        self._reply('POST', 409 if exists else 200, {})
+
+    def do_PUT(self) -> None:  # pylint: disable=invalid-name
+        body = self._body()
+        time.sleep(self.server.latency)
+        self.server.rrsets[self._key()] = body
+        self._reply('PUT', 200, {})
+
+    def do_DELETE(self) -> None:  # pylint: disable=invalid-name
+        self.server.rrsets.pop(self._key(), None)
+        self._reply('DELETE', 200, {})
+
+    def _key(self) -> str:
+        return self.path.split('?')[0]
+
+    def _body(self) -> dict:
+        return json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+
+    def _reply(self, method: str, status: int, payload: dict) -> None:
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.calls[(method, status)] += 1
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _writer(api_url: str, lock_dir: str, index: int, barrier) -> None:
+    client = _GCoreClient(token='benchmark', api_url=api_url, lock_dir=lock_dir)
+    client.retry_delay = 0.01
+    barrier.wait()
+    try:
+        client.add_txt_record(ZONE, RECORD_NAME, 'value-{}'.format(index), 300)
+    except Exception as err:  # pylint: disable=broad-except
+        print('writer {} failed: {}'.format(index, err))
+
+
+def run(processes: int, latency: float, lock_dir: str = None) -> None:
+    """Run one round of concurrent writers and print its statistics."""
+    server = MockDnsApi(latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    barrier = multiprocessing.Barrier(processes)
+    workers = [
+        multiprocessing.Process(target=_writer, args=(api_url, lock_dir, index, barrier))
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    rrset = next(iter(server.rrsets.values()), {})
+    stored = len(rrset.get('resource_records', []))
+    writes = sum(count for (method, _), count in server.calls.items() if method != 'GET')
+    print('{:<8} processes={} elapsed={:.2f}s api_calls={} writes={} conflicts={} lost_values={}'.format(
+        'locked' if lock_dir else 'unlocked',
+        processes,
+        elapsed,
+        sum(server.calls.values()),
+        writes,
+        server.calls[('POST', 409)],
+        processes - stored,
+    ))
+
+
+def main() -> None:
+    """Compare uncoordinated and coordinated writers."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--processes', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.02, help='Mock API latency per request in seconds.')
+    args = parser.parse_args()
+    run(args.processes, args.latency)
+    with tempfile.TemporaryDirectory() as lock_dir:
+        run(args.processes, args.latency, lock_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,48 @@ Named Arguments
 ``--dns-gcore-propagation-seconds``       The number of seconds to wait for DNS
                                           to propagate before asking the ACME
                                           server to verify the DNS record. (Default: 10)
+``--dns-gcore-trace-file``                Append a Chrome trace-event JSON
+                                          timeline of plugin phases (login,
+                                          zone lookup, API requests,
+                                          propagation wait) to this file; all
+                                          certificates of a ``certbot renew``
+                                          run share one timeline. (Optional)
+``--dns-gcore-preflight``                 Authenticate and resolve the zones of
+                                          all requested domains before the ACME
+                                          order is created, reporting every
+                                          problem at once. (Optional)
+``--dns-gcore-follow-cnames``             Write TXT records at the target of
+                                          ``_acme-challenge`` CNAMEs instead of
+                                          the name itself. (Optional)
+``--dns-gcore-challenge-zone``            Dedicated zone all ``_acme-challenge``
+                                          CNAMEs point into; all TXT records are
+                                          written there. Implies
+                                          ``--dns-gcore-follow-cnames``.
+                                          (Optional)
+``--dns-gcore-assume-cnames``             Assume every
+                                          ``_acme-challenge.<domain>`` is a
+                                          CNAME to ``<domain>.<challenge
+                                          zone>`` instead of looking it up.
+                                          Requires
+                                          ``--dns-gcore-challenge-zone``.
+                                          (Optional)
+``--dns-gcore-adaptive-propagation``      Wait per zone as long as previous
+                                          validations needed, learned under the
+                                          work dir, capped by
+                                          ``--dns-gcore-propagation-seconds``.
+                                          (Optional)
+``--dns-gcore-nameservers``               Comma separated authoritative
+                                          nameservers polled by
+                                          ``--dns-gcore-adaptive-propagation``
+                                          to observe when TXT records are
+                                          served; empty to not observe them.
+                                          (Default: ns1.gcorelabs.net,
+                                          ns2.gcdn.services)
+``--dns-gcore-lock-dir``                  Directory shared by certbot processes
+                                          on this host; their writes to the same
+                                          ``_acme-challenge`` rrset are
+                                          serialised and merged into one API
+                                          write. (Optional)
 ========================================  =====================================
 
 
@@ -81,6 +123,44 @@ Also you can specify the G-Core ``auth`` and ``dns`` urls.
     dns_gcore_auth_url = https://auth.example.com
     dns_gcore_api_url = https://dns_api.example.com
 
+CNAME-delegated challenge zone
+------------------------------
+
+Large zones do not have to be writable by Certbot. Point the
+``_acme-challenge`` names into a small dedicated zone and give the API token
+write access to that zone:
+
+.. code-block:: text
+
+   _acme-challenge.example.com.      CNAME  example.com.acme.example.net.
+   _acme-challenge.www.example.com.  CNAME  www.example.com.acme.example.net.
+
+and run Certbot with ``--dns-gcore-challenge-zone=acme.example.net``.
+The CNAMEs are looked up once per run through the G-Core API, so the token
+also needs read access to the original zones. When the CNAMEs follow the
+``<domain>.<challenge zone>`` pattern shown above, add
+``--dns-gcore-assume-cnames`` to skip the lookup; the token then needs access
+to the challenge zone only, and the original zones may be hosted anywhere.
+
+Adaptive propagation wait
+-------------------------
+
+With ``--dns-gcore-adaptive-propagation`` the plugin records, per zone, how
+long it waited and whether the validation succeeded, in
+``<work-dir>/dns-gcore/propagation.json``. During the wait it polls the
+authoritative nameservers (``--dns-gcore-nameservers``) and records when they
+serve the new TXT records. A successful run needed the seconds it waited, or the
+observed seconds plus a 5 second margin if that is less. Later runs wait the
+90th percentile of what the last 20 successful runs needed, never longer than
+``--dns-gcore-propagation-seconds``; zones without a successful run wait the
+configured seconds. A wait is thus never shortened below one that worked unless
+the records were observed sooner. After a failed validation the zone waits
+longer than the failed wait for 30 days. The learned waits can be shown with:
+
+.. code-block:: bash
+
+   certbot-dns-gcore-report --work-dir /var/lib/letsencrypt --propagation-seconds 80
+
 Examples
 --------
 
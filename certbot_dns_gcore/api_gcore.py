@@ -1,5 +1,6 @@
 """Wrapper for G-Core DNS API."""
 
+import hashlib
 import http
 import logging
 import re
@@ -9,6 +10,9 @@ import urllib.parse
 import requests
 from requests import Session
 
+from .tracing import NullTracer
+from .tracing import Tracer
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,8 +37,11 @@ class GCoreClient:
     _timeout = 10.0
     _error_format = 'Error %s. %s: %r, data: "%r", response: %s'
 
-    def __init__(self, token=None, login=None, password=None, api_url=None, dns_api_url=None, auth_url=None):
+    def __init__(self, token=None, login=None, password=None, api_url=None, dns_api_url=None, auth_url=None,
+                 tracer: Tracer = None):
         self._session = Session()
+        self.tracer = tracer or NullTracer()
+        self._identity = token if token is not None else login
         if token is not None:
             self._session.headers.update({'Authorization': f'APIKey {token}'})
         elif login is not None and password is not None:
@@ -51,19 +58,28 @@ class GCoreClient:
         if auth_url:
             self._auth_url = auth_url
 
+    @property
+    def endpoint_id(self) -> str:
+        """Short hash of the DNS API URL and the account, e.g. to keep lock files of different accounts apart."""
+        return hashlib.sha256('{}\n{}'.format(self._dns_api_url, self._identity).encode()).hexdigest()[:16]
+
     def _auth(self, url, login, password):
         """Get auth token."""
-        responce = self._session.request(
-            'POST',
-            self._build_url(url, 'auth', 'jwt', 'login'),
-            json={'username': login, 'password': password},
-        )
+        with self.tracer.span('GCoreClient._auth', url=url) as span:
+            responce = self._session.request(
+                'POST',
+                self._build_url(url, 'auth', 'jwt', 'login'),
+                json={'username': login, 'password': password},
+            )
+            span['status'] = responce.status_code
         responce.raise_for_status()
         return responce.json()['access']
 
     def _request(self, method: str, url: str, params=None, data=None) -> requests.Response or requests.RequestException:
         """Requests handler."""
-        responce = self._session.request(method, url, params=params, json=data, timeout=self._timeout)
+        with self.tracer.span('GCoreClient._request', method=method, url=url) as span:
+            responce = self._session.request(method, url, params=params, json=data, timeout=self._timeout)
+            span['status'] = responce.status_code
         if responce.status_code in (  # pylint: disable=R1720
                 http.HTTPStatus.BAD_REQUEST, http.HTTPStatus.INTERNAL_SERVER_ERROR,
         ):
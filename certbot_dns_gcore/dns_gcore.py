@@ -1,15 +1,32 @@
 """DNS Authenticator for G-Core."""
 
 import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
 from typing import Optional
+from typing import Set
+from typing import Tuple
 
+import requests
+from acme import challenges
+from certbot import achallenges
 from certbot import errors
+from certbot.display import util as display_util
 from certbot.plugins import dns_common
 from certbot.plugins.dns_common import CredentialsConfiguration
 
 from . import api_gcore
+from . import tracing
+from .locking import RrsetCoordinator
+from .observation import DEFAULT_NAMESERVERS
+from .observation import TxtObserver
+from .propagation import PropagationStats
 from .api_gcore import GCoreConflictException
 
 logger = logging.getLogger(__name__)
@@ -33,6 +50,13 @@ class Authenticator(dns_common.DNSAuthenticator):
         self.api_url = None
         self.auth_url = None
         self.dns_api_url = None
+        self.tracer = tracing.Tracer() if self.conf('trace-file') else tracing.NullTracer()
+        self._client: Optional[_GCoreClient] = None
+        self._zones: Dict[str, str] = {}
+        self._records: Dict[str, List[Tuple[str, str]]] = {}
+        self._failed_domains: Set[str] = set()
+        self._waited: Optional[int] = None
+        self._observed: Dict[str, float] = {}
 
     @classmethod
     def add_parser_arguments(
@@ -40,10 +64,47 @@ class Authenticator(dns_common.DNSAuthenticator):
     ) -> None:
         super().add_parser_arguments(add, default_propagation_seconds)
         add('credentials', help='G-Core credentials INI file.')
+        add('trace-file', default=None,
+            help='Append a Chrome trace-event JSON timeline of plugin phases to this file.')
+        add('preflight', action='store_true', default=False,
+            help='Check credentials and zones of all requested domains before the ACME order is created.')
+        add('follow-cnames', action='store_true', default=False,
+            help='Write TXT records at the target of _acme-challenge CNAMEs instead of the name itself.')
+        add('challenge-zone', default=None,
+            help='Dedicated zone all _acme-challenge CNAMEs point into; all TXT records are written there. '
+                 'Implies --dns-gcore-follow-cnames.')
+        add('assume-cnames', action='store_true', default=False,
+            help='Assume every _acme-challenge.<domain> is a CNAME to <domain>.<challenge zone> instead of '
+                 'looking it up, so the API token only needs access to --dns-gcore-challenge-zone.')
+        add('adaptive-propagation', action='store_true', default=False,
+            help='Wait per zone as long as previous validations needed, learned under the work dir, '
+                 'capped by --dns-gcore-propagation-seconds.')
+        add('nameservers', default=','.join(DEFAULT_NAMESERVERS),
+            help='Comma separated authoritative nameservers polled by --dns-gcore-adaptive-propagation to '
+                 'observe when TXT records are served; empty to not observe them.')
+        add('lock-dir', default=None,
+            help='Directory shared by certbot processes on this host; their writes to the same '
+                 '_acme-challenge rrset are serialised and merged.')
 
     def more_info(self) -> str:
         return 'This plugin configures a DNS TXT record to respond to a dns-01 challenge using the G-Core API.'
 
+    def prepare(self) -> None:
+        if not self.conf('preflight'):
+            return
+        try:
+            with self.tracer.span('Authenticator.preflight', domains=list(self.config.domains)):
+                self._setup_credentials()
+                try:
+                    client = self._get_client()
+                except requests.RequestException as err:
+                    raise errors.PluginError('G-Core authentication failed: {}'.format(err)) from err
+                client.preflight(self.config.domains)
+        except Exception:
+            # cleanup() is not called when prepare() fails, so keep the trace of the failed run here.
+            self._dump_trace()
+            raise
+
     def _validate_credentials(self, credentials: CredentialsConfiguration) -> None:
         self.token = credentials.conf('apitoken')
         self.email = credentials.conf('email')
@@ -74,36 +135,144 @@ class Authenticator(dns_common.DNSAuthenticator):
             )
 
     def _setup_credentials(self) -> None:
-        self.credentials = self._configure_credentials(
-            'credentials',
-            'G-Core credentials INI file',
-            None,
-            self._validate_credentials
-        )
+        with self.tracer.span('Authenticator._setup_credentials'):
+            self.credentials = self._configure_credentials(
+                'credentials',
+                'G-Core credentials INI file',
+                None,
+                self._validate_credentials
+            )
+
+    def perform(self, achalls: List[achallenges.AnnotatedChallenge]) -> List[challenges.ChallengeResponse]:
+        with self.tracer.span('Authenticator.perform', domains=[_achall_domain(achall) for achall in achalls],
+                              certificate=getattr(self.config, 'certname', None)):
+            self._setup_credentials()
+            self._attempt_cleanup = True
+
+            responses = []
+            for achall in achalls:
+                domain = _achall_domain(achall)
+                self._perform(domain, achall.validation_domain_name(domain), achall.validation(achall.account_key))
+                responses.append(achall.response(achall.account_key))
+
+            self._waited = self._propagation_seconds()
+            self._wait_for_propagation(self._waited)
+        return responses
+
+    def auth_hint(self, failed_achalls: List[achallenges.AnnotatedChallenge]) -> str:
+        self._failed_domains.update(_achall_domain(achall) for achall in failed_achalls)
+        hint = super().auth_hint(failed_achalls)
+        if self._waited is not None and self._waited != self.conf('propagation-seconds'):
+            hint += (' This run waited only {0} seconds as learned by --{1}-adaptive-propagation; '
+                     'the next run waits longer.'.format(self._waited, self.name))
+        return hint
+
+    def cleanup(self, achalls: List[achallenges.AnnotatedChallenge]) -> None:
+        # certbot cleans up when leaving its exit handler; an exception in flight means validation did not finish.
+        aborted = sys.exc_info()[0] is not None
+        try:
+            with self.tracer.span('Authenticator.cleanup', domains=[_achall_domain(achall) for achall in achalls]):
+                super().cleanup(achalls)
+            self._record_propagation(achalls, aborted)
+        finally:
+            self._dump_trace()
+
+    def _dump_trace(self) -> None:
+        if not self.conf('trace-file'):
+            return
+        try:
+            self.tracer.dump(self.conf('trace-file'))
+        except OSError as err:
+            logger.warning('Unable to write trace to %s: %s', self.conf('trace-file'), err)
+
+    def _propagation_seconds(self) -> int:
+        """Configured propagation wait, or the longest wait learned for the zones written in this run."""
+        maximum = self.conf('propagation-seconds')
+        if not self.conf('adaptive-propagation') or not self._zones:
+            return maximum
+        stats = PropagationStats.from_work_dir(self.config.work_dir)
+        seconds = max(stats.wait(zone_name, maximum) for zone_name in set(self._zones.values()))
+        logger.debug('Learned propagation wait: %d seconds (configured: %d)', seconds, maximum)
+        return seconds
+
+    def _record_propagation(self, achalls: List[achallenges.AnnotatedChallenge], aborted: bool) -> None:
+        """
+        Store the outcome of the propagation wait per zone.
+
+        Validation failures reported by the CA through :meth:`auth_hint` are recorded as failed waits.
+        The other zones are recorded as successful only if the run was not ``aborted`` (e.g. by a
+        polling timeout or a network error), as their validation may not have completed. An abort
+        by a signal while polling cannot be told apart from success and is recorded as such.
+        """
+        if not self.conf('adaptive-propagation') or self._waited is None:
+            return
+        outcomes: Dict[str, bool] = {}
+        for domain in (_achall_domain(achall) for achall in achalls):
+            if domain in self._zones:
+                zone_name = self._zones[domain]
+                outcomes[zone_name] = outcomes.get(zone_name, True) and domain not in self._failed_domains
+        if aborted:
+            outcomes = {zone_name: succeeded for zone_name, succeeded in outcomes.items() if not succeeded}
+        stats = PropagationStats.from_work_dir(self.config.work_dir)
+        for zone_name, succeeded in outcomes.items():
+            stats.record(zone_name, self._waited, succeeded, self._observed.get(zone_name))
+        try:
+            stats.save()
+        except OSError as err:
+            logger.warning('Unable to save propagation stats to %s: %s', stats.path, err)
+
+    def _wait_for_propagation(self, seconds: int) -> None:
+        with self.tracer.span('Authenticator.propagation_wait', seconds=seconds) as span_args:
+            display_util.notify('Waiting %d seconds for DNS changes to propagate' % seconds)
+            started = time.monotonic()
+            if self.conf('adaptive-propagation') and self._records:
+                nameservers = [nameserver for nameserver in self.conf('nameservers').split(',') if nameserver.strip()]
+                self._observed = TxtObserver(nameservers).observe(self._records, seconds)
+                span_args['observed'] = self._observed
+            time.sleep(max(0.0, seconds - (time.monotonic() - started)))
 
     def _perform(self, domain: str, validation_name: str, validation: str) -> None:
-        self._get_client().add_txt_record(domain, validation_name, validation, self.ttl)
+        client = self._get_client()
+        client.add_txt_record(domain, validation_name, validation, self.ttl)
+        zone_name, record_name = client.challenge_target(domain, validation_name)
+        self._zones[domain] = zone_name
+        self._records.setdefault(zone_name, []).append((record_name, validation))
 
     def _cleanup(self, domain: str, validation_name: str, validation: str) -> None:
-        self._get_client().del_txt_record(domain, validation_name)
+        self._get_client().del_txt_record(domain, validation_name, validation)
 
     def _get_client(self) -> "_GCoreClient":
         if not self.credentials:  # pragma: no cover
             raise errors.Error("Plugin has not been prepared.")
-        if self.token:
-            return _GCoreClient(
-                token=self.token,
-                api_url=self.api_url,
-                dns_api_url=self.dns_api_url,
-                auth_url=self.auth_url
-            )
-        return _GCoreClient(
-            login=self.email,
-            password=self.password,
-            api_url=self.api_url,
-            dns_api_url=self.dns_api_url,
-            auth_url=self.auth_url
-        )
+        if self._client is not None:
+            return self._client
+        with self.tracer.span('Authenticator._get_client'):
+            if self.token:
+                self._client = _GCoreClient(
+                    token=self.token,
+                    api_url=self.api_url,
+                    dns_api_url=self.dns_api_url,
+                    auth_url=self.auth_url,
+                    tracer=self.tracer,
+                    challenge_zone=self.conf('challenge-zone'),
+                    follow_cnames=self.conf('follow-cnames'),
+                    assume_cnames=self.conf('assume-cnames'),
+                    lock_dir=self.conf('lock-dir'),
+                )
+            else:
+                self._client = _GCoreClient(
+                    login=self.email,
+                    password=self.password,
+                    api_url=self.api_url,
+                    dns_api_url=self.dns_api_url,
+                    auth_url=self.auth_url,
+                    tracer=self.tracer,
+                    challenge_zone=self.conf('challenge-zone'),
+                    follow_cnames=self.conf('follow-cnames'),
+                    assume_cnames=self.conf('assume-cnames'),
+                    lock_dir=self.conf('lock-dir'),
+                )
+        return self._client
 
 
 class _GCoreClient:
@@ -112,9 +281,55 @@ class _GCoreClient:
     """
 
     record_type = 'TXT'
+    preflight_workers = 8
+    write_attempts = 3
+    retry_delay = 0.5
 
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, *args, challenge_zone: Optional[str] = None, follow_cnames: bool = False,
+                 assume_cnames: bool = False, resolver: Optional['CnameResolver'] = None,
+                 lock_dir: Optional[str] = None, **kwargs) -> None:
+        self.challenge_zone = challenge_zone.strip('.') if challenge_zone else None
+        if assume_cnames and not self.challenge_zone:
+            raise errors.PluginError('--dns-gcore-assume-cnames requires --dns-gcore-challenge-zone.')
         self.gcore = api_gcore.GCoreClient(*args, **kwargs)
+        self.coordinator = RrsetCoordinator(lock_dir) if lock_dir else None
+        self._zone_names: Dict[str, str] = {}
+        if resolver is None and assume_cnames:
+            resolver = _ChallengeZoneCnameResolver(self.challenge_zone)
+        elif resolver is None and (follow_cnames or self.challenge_zone):
+            resolver = _ApiCnameResolver(self)
+        self.resolver = resolver
+
+    def preflight(self, domains: Iterable[str]) -> Dict[str, str]:
+        """
+        Resolve zones for all domains in parallel, warming the zone cache.
+
+        :param domains: The requested certificate domains (wildcards allowed).
+        :returns: Mapping of domain to zone name.
+        :raises certbot.errors.PluginError: listing every domain whose zone could not be resolved
+        """
+        # ACME validates ``*.example.com`` as ``example.com``, so warm the cache for that name.
+        names = sorted({domain[2:] if domain.startswith('*.') else domain for domain in domains})
+        if not names:
+            return {}
+        zones, problems = {}, []
+        with ThreadPoolExecutor(max_workers=min(self.preflight_workers, len(names))) as executor:
+            futures = {
+                name: executor.submit(self.challenge_target, name, '{}.{}'.format(challenges.DNS01.LABEL, name))
+                for name in names
+            }
+        for name, future in futures.items():
+            try:
+                zones[name] = future.result()[0]
+            except (errors.PluginError, api_gcore.GCoreException, api_gcore.GCoreNotFoundException,
+                    requests.RequestException) as err:
+                problems.append('{}: {}'.format(name, err))
+        if problems:
+            # certbot only shows the repr of a PluginError raised from prepare(), so log one line per domain.
+            for problem in problems:
+                logger.error('G-Core preflight check failed for %s', problem)
+            raise errors.PluginError('G-Core preflight check failed:\n' + '\n'.join(problems))
+        return zones
 
     def add_txt_record(
             self, domain: str, record_name: str, record_content: str, record_ttl: int
@@ -128,41 +343,169 @@ class _GCoreClient:
         :param int record_ttl: The record TTL (number of seconds that the record may be cached).
         :raises certbot.errors.PluginError: if an error occurs communicating with the G-Core DNS API
         """
-        domain = self._find_zone_name(domain=domain)
-        try:
-            self.gcore.record_create(
-                domain, record_name, self.record_type, data=self._data_for_txt(record_ttl, [record_content]),
-            )
-        except GCoreConflictException:
-            logger.debug('Record already present on zone. Try to update record content')
-            exist_record_content = self.gcore.record_content(domain, record_name, self.record_type)
-            if record_content not in exist_record_content:
-                exist_record_content.append(record_content)
-            self.gcore.record_update(
-                domain,
-                record_name,
-                self.record_type,
-                data=self._data_for_txt(record_ttl, exist_record_content),
-            )
+        with self.gcore.tracer.span('_GCoreClient.add_txt_record', domain=domain, record_name=record_name) as span:
+            domain, record_name = self.challenge_target(domain, record_name)
+            span['zone'] = domain
+            if self.coordinator is not None:
+                self._write_txt_changes(
+                    domain, record_name, [{'op': 'add', 'content': record_content, 'ttl': record_ttl}],
+                )
+                logger.debug('Successfully added TXT record with record_name: %s', record_name)
+                return
+            try:
+                self.gcore.record_create(
+                    domain, record_name, self.record_type, data=self._data_for_txt(record_ttl, [record_content]),
+                )
+            except GCoreConflictException:
+                logger.debug('Record already present on zone. Try to update record content')
+                exist_record_content = self.gcore.record_content(domain, record_name, self.record_type)
+                if record_content not in exist_record_content:
+                    exist_record_content.append(record_content)
+                self.gcore.record_update(
+                    domain,
+                    record_name,
+                    self.record_type,
+                    data=self._data_for_txt(record_ttl, exist_record_content),
+                )
         logger.debug('Successfully added TXT record with record_name: %s', record_name)
 
-    def del_txt_record(self, domain: str, record_name: str) -> None:
+    def del_txt_record(self, domain: str, record_name: str, record_content: Optional[str] = None) -> None:
         """
         Delete a TXT record using the supplied information.
 
+        Only ``record_content`` is removed from the rrset, so values added by concurrent
+        runs for the same name are kept; the rrset is deleted once it is empty.
+        Without ``record_content`` the whole rrset is deleted.
+
         :param str domain: The domain to use for verification.
         :param str record_name: The record name (typically beginning with '_acme-challenge.').
         :param str record_content: The record content (typically the challenge validation).
         """
-        try:
-            domain = self._find_zone_name(domain)
-            self.gcore.record_get(domain, record_name, self.record_type)
-        except (api_gcore.GCoreNotFoundException, api_gcore.GCoreConflictException) as err:
-            logger.debug('Encountered error finding zone_id during deletion: %s', err)
-            return
-        self.gcore.record_delete(domain, record_name, self.record_type)
+        with self.gcore.tracer.span('_GCoreClient.del_txt_record', domain=domain, record_name=record_name) as span:
+            try:
+                domain, record_name = self.challenge_target(domain, record_name)
+                span['zone'] = domain
+                # The coordinated write reads the rrset itself once it holds the lock.
+                rrset = None
+                if record_content is None or self.coordinator is None:
+                    rrset = self.gcore.record_get(domain, record_name, self.record_type)
+            except (api_gcore.GCoreNotFoundException, api_gcore.GCoreConflictException) as err:
+                logger.debug('Encountered error finding zone_id during deletion: %s', err)
+                return
+            if record_content is None:
+                self.gcore.record_delete(domain, record_name, self.record_type)
+            else:
+                try:
+                    self._write_txt_changes(domain, record_name, [{'op': 'remove', 'content': record_content}], rrset)
+                except errors.PluginError as err:
+                    logger.warning('%s', err)
+                    return
         logger.debug('Successfully deleted TXT record.')
 
+    def _write_txt_changes(self, zone_name: str, record_name: str, changes: List[dict],
+                           rrset: Optional[dict] = None) -> None:
+        """Apply changes to the TXT rrset, coordinated with other processes when a lock dir is set."""
+        if self.coordinator is None:
+            self._apply_txt_changes(zone_name, record_name, changes, rrset)
+            return
+        with self.gcore.tracer.span('_GCoreClient.coordinated_write', zone=zone_name, record_name=record_name):
+            self.coordinator.submit(
+                (self.gcore.endpoint_id, zone_name, record_name, self.record_type),
+                changes,
+                lambda batch: self._apply_txt_changes(zone_name, record_name, batch),
+            )
+
+    def _apply_txt_changes(self, zone_name: str, record_name: str, changes: List[dict],
+                           rrset: Optional[dict] = None) -> None:
+        """
+        Apply ``add``/``remove`` changes to the TXT rrset with a single read-modify-write.
+
+        A conflicting write makes the cycle start over from a fresh read, at most ``write_attempts`` times.
+
+        :param rrset: The current rrset, if it has just been read.
+        :raises certbot.errors.PluginError: if the changes could not be written
+        """
+        for attempt in range(1, self.write_attempts + 1):
+            if rrset is None:
+                try:
+                    rrset = self.gcore.record_get(zone_name, record_name, self.record_type)
+                except api_gcore.GCoreNotFoundException:
+                    rrset = {}
+            contents = self._txt_contents(rrset)
+            ttl = rrset.get('ttl', Authenticator.ttl)
+            updated = list(contents)
+            for change in changes:
+                if change['op'] == 'add' and change['content'] not in updated:
+                    updated.append(change['content'])
+                    ttl = change['ttl']
+                elif change['op'] == 'remove' and change['content'] in updated:
+                    updated.remove(change['content'])
+            if updated == contents:
+                logger.debug('TXT rrset %s is already up to date', record_name)
+                return
+            try:
+                if not rrset:
+                    self.gcore.record_create(
+                        zone_name, record_name, self.record_type, data=self._data_for_txt(ttl, updated),
+                    )
+                elif updated:
+                    self.gcore.record_update(
+                        zone_name, record_name, self.record_type, data=self._data_for_txt(ttl, updated),
+                    )
+                else:
+                    self.gcore.record_delete(zone_name, record_name, self.record_type)
+                return
+            except api_gcore.GCoreNotFoundException as err:
+                logger.debug('TXT rrset %s was deleted concurrently (attempt %d/%d): %s',
+                             record_name, attempt, self.write_attempts, err)
+                rrset = {}
+            except api_gcore.GCoreConflictException as err:
+                logger.debug('Conflict writing TXT rrset %s (attempt %d/%d): %s',
+                             record_name, attempt, self.write_attempts, err)
+                rrset = None
+            if attempt < self.write_attempts:
+                time.sleep(self.retry_delay * attempt)
+        raise errors.PluginError(
+            'Unable to update TXT record {0} after {1} attempts'.format(record_name, self.write_attempts)
+        )
+
+    @staticmethod
+    def _txt_contents(rrset: dict) -> List[str]:
+        """Values of a TXT rrset."""
+        return [record['content'][0] for record in rrset.get('resource_records') or []]
+
+    def challenge_target(self, domain: str, record_name: str) -> Tuple[str, str]:
+        """
+        Find the zone and rrset name the TXT record for ``record_name`` must be written to.
+
+        When CNAME following is enabled and ``record_name`` is a CNAME, the record is written
+        at the CNAME target, e.g. into a dedicated validation zone.
+
+        :returns: The zone name and the rrset name.
+        :raises certbot.errors.PluginError: if a challenge zone is configured and ``record_name`` is not
+            a CNAME into it, or if the CNAME cannot be looked up
+        """
+        target = self.resolver.resolve(record_name) if self.resolver is not None else None
+        if target is None and self.challenge_zone is not None:
+            raise errors.PluginError(
+                'No CNAME found for {0}; with the challenge zone {1} it must be a CNAME into that zone, '
+                'e.g. {0} CNAME {2}.{1}. If the CNAME exists but is not hosted in this G-Core account, '
+                'use --dns-gcore-assume-cnames.'
+                .format(record_name, self.challenge_zone, record_name.split('.', 1)[-1])
+            )
+        if target is None:
+            return self._find_zone_name(domain), record_name
+        if self.challenge_zone is None:
+            return self._find_zone_name(target), target
+        if target != self.challenge_zone and not target.endswith('.' + self.challenge_zone):
+            raise errors.PluginError(
+                '{0} is a CNAME to {1}, which is outside of the challenge zone {2}.'
+                .format(record_name, target, self.challenge_zone)
+            )
+        logger.debug('Using CNAME target %s in challenge zone %s for %s', target, self.challenge_zone, record_name)
+        # Looked up once per run, so the token and the challenge zone are checked even without CNAME lookups.
+        return self._find_zone_name(self.challenge_zone), target
+
     @classmethod
     def _data_for_txt(cls, ttl, contents: list) -> dict:
         """Preparing data for TXT record."""
@@ -178,6 +521,16 @@ class _GCoreClient:
         Returns:
             The zone_id, if found.
         """
+        if domain in self._zone_names:
+            return self._zone_names[domain]
+        with self.gcore.tracer.span('_GCoreClient._find_zone_name', domain=domain) as span:
+            zone_name = self._lookup_zone_name(domain)
+            span['zone'] = zone_name
+        self._zone_names[domain] = zone_name
+        return zone_name
+
+    def _lookup_zone_name(self, domain: str) -> str:
+        """Query the G-Core DNS API for the zone serving ``domain``."""
         limit = 100
         domain_slit_list = '.'.join(domain.split('.')[-2:])
         zone_name_guesses = dns_common.base_domain_name_guesses(domain)[:-1]
@@ -194,3 +547,66 @@ class _GCoreClient:
             'entered correctly and is already associated with the '
             'supplied G-Core account.'.format(domain, zone_name_guesses)
         )
+
+
+class CnameResolver:
+    """
+    Resolver of ``_acme-challenge`` CNAME targets.
+
+    Answers are cached for the lifetime of the resolver, i.e. for one certbot run.
+    Subclasses implement :meth:`_lookup`.
+    """
+
+    def __init__(self) -> None:
+        self._targets: Dict[str, Optional[str]] = {}
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Return the CNAME target of ``name`` without the trailing dot, or None if it is not a CNAME."""
+        if name not in self._targets:
+            target = self._lookup(name)
+            self._targets[name] = target.rstrip('.') if target else None
+        return self._targets[name]
+
+    def _lookup(self, name: str) -> Optional[str]:  # pragma: no cover
+        raise NotImplementedError()
+
+
+class _ApiCnameResolver(CnameResolver):
+    """Looks CNAME records up through the G-Core DNS API in the zone hosting the name."""
+
+    def __init__(self, client: _GCoreClient) -> None:
+        super().__init__()
+        self._client = client
+
+    def _lookup(self, name: str) -> Optional[str]:
+        try:
+            zone_name = self._client._find_zone_name(name)  # pylint: disable=protected-access
+            rrset = self._client.gcore.record_get(zone_name, name, 'CNAME')
+        except (errors.PluginError, api_gcore.GCoreNotFoundException) as err:
+            logger.debug('No CNAME found for %s: %s', name, err)
+            return None
+        except (api_gcore.GCoreException, requests.RequestException) as err:
+            raise errors.PluginError(
+                'Unable to look up the CNAME of {0} through the G-Core API: {1}. The API token needs read '
+                'access to the zone of {0}, or use --dns-gcore-assume-cnames to skip the lookup.'
+                .format(name, err)
+            ) from err
+        records = rrset.get('resource_records') or []
+        return records[0]['content'][0] if records else None
+
+
+class _ChallengeZoneCnameResolver(CnameResolver):
+    """Assumes ``_acme-challenge.<domain>`` is a CNAME to ``<domain>.<challenge zone>`` without a lookup."""
+
+    def __init__(self, challenge_zone: str) -> None:
+        super().__init__()
+        self._challenge_zone = challenge_zone
+
+    def _lookup(self, name: str) -> Optional[str]:
+        return '{}.{}'.format(name.split('.', 1)[-1], self._challenge_zone)
+
+
+def _achall_domain(achall: achallenges.AnnotatedChallenge) -> str:
+    """Domain of the challenge, supporting certbot releases before ``identifier`` was added."""
+    identifier = getattr(achall, 'identifier', None)
+    return identifier.value if identifier is not None else achall.domain
@@ -0,0 +1,118 @@
+"""Cross-process coordination of rrset writes on one host."""
+
+import contextlib
+import json
+import logging
+import os
+import re
+import time
+import typing
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> typing.Iterator[None]:
+    """Hold an exclusive lock on ``path``, blocking until it is available."""
+    with open(path, 'a+', encoding='utf-8') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RrsetCoordinator:
+    """
+    Serialises writes to the same rrset between processes sharing ``directory``.
+
+    Every writer queues its changes and then waits for the rrset lock. The lock holder applies
+    all queued changes with a single write and records the ids of the other writers' changes as
+    done, so those writers return without calling the API. A writer whose changes are neither
+    queued nor done (the holder died between draining the queue and finishing the write) applies
+    them itself.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, key: typing.Tuple[str, ...], changes: typing.List[dict],
+               apply: typing.Callable[[typing.List[dict]], None]) -> None:
+        """
+        Queue ``changes`` for the rrset identified by ``key`` and wait until they are applied.
+
+        :param key: Identifies the rrset, e.g. (API endpoint, zone, rrset name, type).
+        :param changes: The changes of this writer.
+        :param apply: Callback writing a batch of queued changes to the API.
+        """
+        base = os.path.join(self.directory, re.sub(r'[^\w.-]', '_', '_'.join(key)))
+        queue_path, queue_lock, done_path = base + '.queue', base + '.queue.lock', base + '.done'
+        queued = [dict(change, id=uuid.uuid4().hex) for change in changes]
+        own_ids = {change['id'] for change in queued}
+        with file_lock(queue_lock):
+            self._append(queue_path, queued)
+
+        with file_lock(base + '.lock'):
+            with file_lock(queue_lock):
+                batch = self._drain(queue_path)
+                if not own_ids & {change['id'] for change in batch}:
+                    if self._take_done(done_path, own_ids):
+                        logger.debug('Changes to %s were applied by another writer', key)
+                        return
+                    logger.warning('Changes to %s were lost by an interrupted writer; applying them again', key)
+                    batch.extend(queued)
+            logger.debug('Applying %d queued changes to %s', len(batch), key)
+            others = [change for change in batch if change['id'] not in own_ids]
+            try:
+                apply(batch)
+            except BaseException:
+                # Writers still waiting for the lock retry their changes; ours fail with the exception.
+                with file_lock(queue_lock):
+                    self._append(queue_path, others)
+                raise
+            with file_lock(queue_lock):
+                self._append(done_path, [{'id': change['id']} for change in others])
+
+    @staticmethod
+    def _take_done(done_path: str, ids: typing.Set[str]) -> bool:
+        """Remove ``ids`` from the done file; True if all of them were there."""
+        done = RrsetCoordinator._drain(done_path)
+        RrsetCoordinator._append(done_path, [entry for entry in done if entry['id'] not in ids])
+        return ids <= {entry['id'] for entry in done}
+
+    @staticmethod
+    def _append(queue_path: str, changes: typing.List[dict]) -> None:
+        with open(queue_path, 'a', encoding='utf-8') as queue_file:
+            for change in changes:
+                queue_file.write(json.dumps(change) + '\n')
+
+    @staticmethod
+    def _drain(queue_path: str) -> typing.List[dict]:
+        try:
+            with open(queue_path, 'r+', encoding='utf-8') as queue_file:
+                batch = [json.loads(line) for line in queue_file if line.strip()]
+                queue_file.truncate(0)
+        except FileNotFoundError:
+            return []
+        return batch
@@ -0,0 +1,149 @@
+"""Observation of TXT records on authoritative nameservers."""
+
+import logging
+import random
+import socket
+import struct
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESERVERS = ('ns1.gcorelabs.net', 'ns2.gcdn.services')
+
+_TYPE_TXT = 16
+_TYPE_OPT = 41
+_CLASS_IN = 1
+_UDP_PAYLOAD = 4096
+
+
+def query_txt(address: typing.Tuple[str, int], name: str, timeout: float) -> typing.List[str]:
+    """
+    Ask the nameserver at ``address`` non-recursively for the TXT values of ``name``.
+
+    :raises OSError: When the nameserver does not answer within ``timeout`` seconds.
+    :raises ValueError: When the answer is malformed or the query was refused.
+    """
+    query_id = random.getrandbits(16)
+    question = b''.join(
+        bytes([len(label)]) + label.encode('idna') for label in name.rstrip('.').split('.')
+    ) + b'\0' + struct.pack('!HH', _TYPE_TXT, _CLASS_IN)
+    # No recursion desired; the OPT record allows answers larger than 512 bytes.
+    packet = struct.pack('!HHHHHH', query_id, 0, 1, 0, 0, 1) + question \
+        + b'\0' + struct.pack('!HHIH', _TYPE_OPT, _UDP_PAYLOAD, 0, 0)
+    family = socket.AF_INET6 if ':' in address[0] else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        sock.sendto(packet, address)
+        while True:
+            response = sock.recv(_UDP_PAYLOAD)
+            if len(response) >= 12 and struct.unpack('!H', response[:2])[0] == query_id:
+                break
+    try:
+        return _parse_txt(response)
+    except struct.error as err:
+        raise ValueError('Malformed DNS response: {}'.format(err)) from err
+
+
+def _parse_txt(response: bytes) -> typing.List[str]:
+    flags, questions, answers = struct.unpack('!HHH', response[2:8])
+    rcode = flags & 0xF
+    if rcode == 3:  # NXDOMAIN
+        return []
+    if rcode:
+        raise ValueError('DNS query failed with rcode {}'.format(rcode))
+    offset = 12
+    for _ in range(questions):
+        offset = _skip_name(response, offset) + 4
+    values = []
+    for _ in range(answers):
+        offset = _skip_name(response, offset)
+        rtype, _, _, length = struct.unpack('!HHIH', response[offset:offset + 10])
+        offset += 10
+        rdata, offset = response[offset:offset + length], offset + length
+        if rtype == _TYPE_TXT:
+            strings, position = [], 0
+            while position < len(rdata):
+                strings.append(rdata[position + 1:position + 1 + rdata[position]])
+                position += 1 + rdata[position]
+            values.append(b''.join(strings).decode('utf-8', 'replace'))
+    return values
+
+
+def _skip_name(response: bytes, offset: int) -> int:
+    while True:
+        if offset >= len(response):
+            raise ValueError('Truncated DNS response')
+        length = response[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += 1 + length
+
+
+def _split_host_port(nameserver: str) -> typing.Tuple[str, str]:
+    """Split ``host``, ``host:port`` or ``[ipv6]:port``."""
+    if nameserver.startswith('['):
+        host, _, port = nameserver[1:].partition(']')
+        return host, port.lstrip(':')
+    if nameserver.count(':') == 1:
+        host, _, port = nameserver.partition(':')
+        return host, port
+    return nameserver, ''
+
+
+class TxtObserver:
+    """Measures when written TXT records are served by every authoritative nameserver."""
+
+    interval = 1.0
+    timeout = 1.0
+
+    def __init__(self, nameservers: typing.Iterable[str]) -> None:
+        self.addresses: typing.List[typing.Tuple[str, int]] = []
+        for nameserver in nameservers:
+            host, port = _split_host_port(nameserver.strip())
+            try:
+                info = socket.getaddrinfo(host, int(port or 53), type=socket.SOCK_DGRAM)
+            except (OSError, ValueError) as err:
+                logger.warning('Unable to resolve nameserver %s, not observing it: %s', nameserver, err)
+                continue
+            self.addresses.append(info[0][4][:2])
+
+    def observe(self, records: typing.Dict[str, typing.List[typing.Tuple[str, str]]],
+                deadline: float) -> typing.Dict[str, float]:
+        """
+        Poll the nameservers until they serve all records of a zone, for at most ``deadline`` seconds.
+
+        :param records: (name, value) pairs of the TXT records per zone.
+        :returns: Seconds after which all records of a zone were served, for the zones where they were.
+        """
+        if not self.addresses:
+            return {}
+        started = time.monotonic()
+        pending = {
+            zone_name: {(address, name, value) for address in self.addresses for name, value in zone_records}
+            for zone_name, zone_records in records.items()
+        }
+        observed: typing.Dict[str, float] = {}
+        while pending:
+            for zone_name, missing in list(pending.items()):
+                for address, name, value in list(missing):
+                    remaining = deadline - (time.monotonic() - started)
+                    if remaining <= 0:
+                        break
+                    try:
+                        if value in query_txt(address, name, min(self.timeout, remaining)):
+                            missing.discard((address, name, value))
+                    except (OSError, ValueError) as err:
+                        logger.debug('TXT query for %s at %s failed: %s', name, address[0], err)
+                if not missing:
+                    observed[zone_name] = time.monotonic() - started
+                    del pending[zone_name]
+            remaining = deadline - (time.monotonic() - started)
+            if pending and remaining <= self.interval:
+                break
+            if pending:
+                time.sleep(self.interval)
+        logger.debug('Observed TXT records after %s seconds', observed)
+        return observed
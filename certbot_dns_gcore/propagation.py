@@ -0,0 +1,147 @@
+"""Per-zone propagation wait learned from previous runs."""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import time
+import typing
+
+from certbot.compat import misc
+
+logger = logging.getLogger(__name__)
+
+
+class PropagationStats:
+    """
+    Persistent per-zone history of propagation waits after which validation succeeded or failed.
+
+    A successful run needed at most the seconds it waited, or less if the TXT records were
+    observed on the zone's authoritative nameservers earlier (plus a ``margin``). A zone waits
+    the 90th percentile of what its last ``history`` successful runs needed, so it never waits
+    less than a proven wait unless observations show the records were served sooner. Failed
+    waits are remembered for ``failure_ttl`` seconds; while one is, the zone waits more than it.
+    Zones without successful runs wait the configured ``--dns-gcore-propagation-seconds``.
+    """
+
+    filename = os.path.join('dns-gcore', 'propagation.json')
+    history = 20
+    percentile = 0.9
+    margin = 5
+    failure_ttl = 30 * 24 * 3600
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.zones: typing.Dict[str, dict] = self._load()
+        self._recorded: typing.List[typing.Tuple[str, dict]] = []
+
+    @classmethod
+    def from_work_dir(cls, work_dir: str) -> 'PropagationStats':
+        """Stats stored under certbot's work dir."""
+        return cls(os.path.join(work_dir, cls.filename))
+
+    def record(self, zone_name: str, seconds: int, succeeded: bool, observed: typing.Optional[float] = None) -> None:
+        """
+        Remember that validation in ``zone_name`` succeeded or failed after waiting ``seconds``.
+
+        :param observed: Seconds after which the records were served by all authoritative nameservers, if known.
+        """
+        sample = {'seconds': seconds, 'succeeded': succeeded, 'time': int(time.time())}
+        if succeeded:
+            sample['observed'] = observed
+        self._recorded.append((zone_name, sample))
+        self._append(self.zones, zone_name, sample)
+
+    def wait(self, zone_name: str, maximum: int) -> int:
+        """Seconds to wait for ``zone_name``, capped by ``maximum``."""
+        zone = self.zones.get(zone_name, {})
+        samples = zone.get('samples', [])
+        if not samples:
+            return maximum
+        seconds = self._needed_percentile(samples)
+        failed = max((failure['seconds'] for failure in self._recent(zone.get('failures', []))), default=None)
+        if failed is not None and seconds <= failed:
+            above_failed = [sample['seconds'] for sample in samples if sample['seconds'] > failed]
+            seconds = min(above_failed) if above_failed else maximum
+        return min(maximum, max(1, seconds))
+
+    def save(self) -> None:
+        """Write the stats atomically, merging samples written meanwhile by concurrent runs."""
+        zones = self._load()
+        for zone_name, sample in self._recorded:
+            self._append(zones, zone_name, sample)
+        self.zones, self._recorded = zones, []
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w', encoding='utf-8') as stats_file:
+            json.dump(self.zones, stats_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def report(self, maximum: int) -> str:
+        """Human readable per-zone summary."""
+        line = '{:<40} {:>7} {:>10} {:>8} {:>5}'
+        lines = [line.format('zone', 'samples', 'p90 needed', 'failures', 'next')]
+        for zone_name, zone in sorted(self.zones.items()):
+            samples = zone.get('samples', [])
+            lines.append(line.format(
+                zone_name,
+                len(samples),
+                self._needed_percentile(samples) if samples else '-',
+                len(self._recent(zone.get('failures', []))),
+                self.wait(zone_name, maximum),
+            ))
+        return '\n'.join(lines)
+
+    def _needed(self, sample: dict) -> int:
+        """Seconds a successful run needed: its wait, or less if the records were observed earlier."""
+        if sample.get('observed') is None:
+            return sample['seconds']
+        return min(sample['seconds'], math.ceil(sample['observed']) + self.margin)
+
+    def _needed_percentile(self, samples: typing.List[dict]) -> int:
+        needed = sorted(self._needed(sample) for sample in samples)
+        return needed[max(0, math.ceil(self.percentile * len(needed)) - 1)]
+
+    def _recent(self, failures: typing.List[dict]) -> typing.List[dict]:
+        return [failure for failure in failures if failure['time'] > time.time() - self.failure_ttl]
+
+    def _append(self, zones: typing.Dict[str, dict], zone_name: str, sample: dict) -> None:
+        zone = zones.setdefault(zone_name, {})
+        sample = dict(sample)
+        if sample.pop('succeeded'):
+            samples = zone.setdefault('samples', [])
+            samples.append(sample)
+            del samples[:-self.history]
+        else:
+            zone['failures'] = self._recent(zone.get('failures', []) + [sample])[-self.history:]
+
+    def _load(self) -> typing.Dict[str, dict]:
+        try:
+            with open(self.path, encoding='utf-8') as stats_file:
+                return json.load(stats_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            logger.warning('Ignoring unreadable propagation stats %s: %s', self.path, err)
+            return {}
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    """Print learned propagation waits."""
+    parser = argparse.ArgumentParser(description='Show per-zone propagation waits learned by certbot-dns-gcore.')
+    parser.add_argument('--work-dir', default=misc.get_default_folder('work'), help="certbot's work dir.")
+    parser.add_argument('--propagation-seconds', type=int, default=10,
+                        help='Configured --dns-gcore-propagation-seconds used as the cap.')
+    args = parser.parse_args(argv)
+    stats = PropagationStats.from_work_dir(args.work_dir)
+    if not stats.zones:
+        print('No propagation stats in {}'.format(stats.path))
+        return 1
+    print(stats.report(args.propagation_seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
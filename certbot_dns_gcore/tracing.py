@@ -0,0 +1,93 @@
+"""Opt-in timeline tracing of plugin phases."""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """
+    Span collector exporting Chrome trace-event JSON.
+
+    Events are appended to the trace file in the trace-event "JSON Array Format", so runs
+    sharing a file (e.g. every certificate of ``certbot renew``) end up on one timeline.
+    The file can be opened in ``chrome://tracing`` or https://ui.perfetto.dev.
+    """
+
+    category = 'dns-gcore'
+
+    def __init__(self) -> None:
+        self._events: typing.List[dict] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._epoch = time.time()
+        self._dumped = 0
+
+    @property
+    def events(self) -> typing.List[dict]:
+        """Recorded trace events."""
+        with self._lock:
+            return list(self._events)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes) -> typing.Iterator[dict]:
+        """
+        Trace the enclosed block.
+
+        Attributes put into the yielded dict (e.g. an HTTP status known only at the end)
+        are stored alongside the ones passed as keyword arguments.
+        """
+        args = {key: value for key, value in attributes.items() if value is not None}
+        start = time.perf_counter()
+        try:
+            yield args
+        except Exception as err:
+            args['error'] = type(err).__name__
+            raise
+        finally:
+            self._record(name, start, time.perf_counter(), args)
+
+    def dump(self, path: str) -> None:
+        """Append spans recorded since the previous dump to ``path``."""
+        with self._lock:
+            events, self._dumped = self._events[self._dumped:], len(self._events)
+        with open(path, 'a', encoding='utf-8') as trace_file:
+            if trace_file.tell() == 0:
+                trace_file.write('[\n')
+            trace_file.write(''.join(json.dumps(event) + ',\n' for event in events))
+        logger.debug('Trace with %d spans appended to %s', len(events), path)
+
+    def _record(self, name: str, start: float, end: float, args: dict) -> None:
+        event = {
+            'name': name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': round((self._epoch + start - self._origin) * 1e6),
+            'dur': round((end - start) * 1e6),
+            'pid': self._pid,
+            'tid': threading.get_ident(),
+            'args': args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+
+def load_events(path: str) -> typing.List[dict]:
+    """Read the events of a trace file written by :meth:`Tracer.dump`."""
+    with open(path, encoding='utf-8') as trace_file:
+        content = trace_file.read().rstrip().rstrip(',')
+    return json.loads(content + ']') if content else []
+
+
+class NullTracer(Tracer):
+    """Tracer used when tracing is disabled: spans are not recorded."""
+
+    def _record(self, name: str, start: float, end: float, args: dict) -> None:
+        pass
@@ -37,5 +37,8 @@ setup(
         'certbot.plugins': [
             'dns-gcore = certbot_dns_gcore.dns_gcore:Authenticator',
         ],
+        'console_scripts': [
+            'certbot-dns-gcore-report = certbot_dns_gcore.propagation:main',
+        ],
     },
 )
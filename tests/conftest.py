@@ -2,8 +2,24 @@ import pytest
 import responses
 from responses import matchers
 import json
+from unittest import mock
 
 from certbot_dns_gcore.api_gcore import GCoreClient
+from certbot_dns_gcore.dns_gcore import Authenticator
+from certbot_dns_gcore.dns_gcore import CnameResolver
+
+
+class StubCnameResolver(CnameResolver):
+    """Local resolver answering from a dict, counting lookups."""
+
+    def __init__(self, targets):
+        super().__init__()
+        self.targets = targets
+        self.lookups = []
+
+    def _lookup(self, name):
+        self.lookups.append(name)
+        return self.targets.get(name)
 
 
 @pytest.fixture
@@ -131,3 +147,81 @@ def mock_dns_api(record_payload, rrset_exists_two_records, mock_get_zones):
         status=200
     )
     yield responses
+
+
+@pytest.fixture
+def challenge_zone():
+    return 'acme.example.net'
+
+
+@pytest.fixture
+def mock_get_challenge_zone(challenge_zone):
+    params = {'limit': '100', 'name': '.'.join(challenge_zone.split('.')[-2:])}
+    responses.add(
+        responses.GET,
+        f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}',
+        match=[responses.matchers.query_param_matcher(params)],
+        json={'zones': [{'name': challenge_zone}]},
+        status=200
+    )
+
+
+@pytest.fixture
+def mock_challenge_zone_record(record_payload, challenge_zone, mock_get_challenge_zone):
+    target = f'www.example.com.{challenge_zone}'
+    responses.add(
+        responses.POST,
+        f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{challenge_zone}/{target}/TXT',
+        json={},
+        status=200
+    )
+    responses.add(
+        responses.GET,
+        f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{challenge_zone}/{target}/TXT',
+        json={'resource_records': [{'content': [record_payload['record_content']], 'enabled': True}], 'ttl': 300},
+        status=200
+    )
+    responses.add(
+        responses.DELETE,
+        f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{challenge_zone}/{target}/TXT',
+        json={},
+        status=200
+    )
+    return target
+
+
+@pytest.fixture
+def authenticator_config(tmp_path):
+    credentials = tmp_path / 'gcore.ini'
+    credentials.write_text('dns_gcore_apitoken = 123\n')
+    credentials.chmod(0o600)
+    return mock.MagicMock(
+        dns_gcore_credentials=str(credentials),
+        dns_gcore_propagation_seconds=60,
+        dns_gcore_trace_file=None,
+        dns_gcore_preflight=False,
+        dns_gcore_follow_cnames=False,
+        dns_gcore_challenge_zone=None,
+        dns_gcore_assume_cnames=False,
+        dns_gcore_adaptive_propagation=False,
+        dns_gcore_nameservers='',
+        dns_gcore_lock_dir=None,
+        domains=['example.com'],
+        work_dir=str(tmp_path),
+        certname=None,
+    )
+
+
+@pytest.fixture
+def authenticator(authenticator_config, monkeypatch):
+    monkeypatch.setattr('certbot_dns_gcore.dns_gcore.display_util.notify', lambda message: None)
+    monkeypatch.setattr('certbot_dns_gcore.dns_gcore.time.sleep', lambda seconds: None)
+    return Authenticator(authenticator_config, 'dns-gcore')
+
+
+def make_achall(domain, validation='123456790'):
+    achall = mock.MagicMock()
+    achall.identifier.value = domain
+    achall.validation_domain_name.return_value = f'_acme-challenge.{domain}'
+    achall.validation.return_value = validation
+    return achall
@@ -1,9 +1,21 @@
+import importlib.metadata
 import json
+import logging
+from unittest import mock
+
 import pytest
 import responses
+from certbot import errors
+from certbot._internal.plugins import disco
 
+from certbot_dns_gcore.api_gcore import GCoreClient
+from certbot_dns_gcore.dns_gcore import Authenticator
 from certbot_dns_gcore.dns_gcore import _GCoreClient
-from tests.conftest import txt_data_expected1, txt_data_expected2
+from certbot_dns_gcore.observation import TxtObserver
+from certbot_dns_gcore.propagation import PropagationStats
+from certbot_dns_gcore.tracing import Tracer
+from certbot_dns_gcore.tracing import load_events
+from tests.conftest import StubCnameResolver, make_achall, txt_data_expected1, txt_data_expected2
 
 
 @pytest.mark.parametrize('kwargs', ({'token': None}, {'login': 'user'}, {'password': 'test'}))
@@ -58,3 +70,509 @@ def test_data_for_txt(in_data, out_data):
 def test_find_zone_name_success(record_payload, subdomain, mock_auth, mock_get_zones):
     # check
     assert _GCoreClient(token='test')._find_zone_name(subdomain) == record_payload['domain']
+
+
+@responses.activate
+def test_add_txt_record_traced(record_payload, mock_auth, mock_get_zones, mock_post_record, tmp_path):
+    # init
+    tracer = Tracer()
+    trace_file = tmp_path / 'trace.json'
+
+    # act
+    _GCoreClient(login='user', password='test', tracer=tracer).add_txt_record(**record_payload)
+    tracer.dump(str(trace_file))
+
+    # check
+    events = {event['name']: event for event in load_events(str(trace_file))}
+    assert events['GCoreClient._auth']['args']['status'] == 200
+    assert events['_GCoreClient.add_txt_record']['args']['zone'] == record_payload['domain']
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events.values())
+    requests_ = [event for event in tracer.events if event['name'] == 'GCoreClient._request']
+    assert [(event['args']['method'], event['args']['status']) for event in requests_] == [('GET', 200), ('POST', 200)]
+
+
+@responses.activate
+def test_preflight_warms_zone_cache(record_payload, mock_auth, mock_get_zones, mock_post_record):
+    # init
+    client = _GCoreClient(token='test')
+
+    # act
+    zones = client.preflight(['example.com', '*.example.com', 'www.example.com'])
+    client.add_txt_record(**record_payload)
+
+    # check: one zone lookup per distinct name, none repeated by add_txt_record
+    assert zones == {'example.com': 'example.com', 'www.example.com': 'example.com'}
+    assert len([call for call in responses.calls if call.request.method == 'GET']) == 2
+
+
+@responses.activate
+def test_preflight_reports_all_problems(mock_auth, mock_get_zones):
+    # init
+    for name in ('example.org', 'example.net'):
+        responses.add(
+            responses.GET,
+            f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}',
+            match=[responses.matchers.query_param_matcher({'limit': '100', 'name': name})],
+            json={'zones': []},
+            status=200
+        )
+
+    # act
+    with pytest.raises(errors.PluginError) as err:
+        _GCoreClient(token='test').preflight(['example.com', 'a.example.org', 'b.example.net'])
+
+    # check
+    assert 'a.example.org' in str(err.value)
+    assert 'b.example.net' in str(err.value)
+    assert 'example.com:' not in str(err.value)
+
+
+@responses.activate
+def test_challenge_zone_cname_delegation(record_payload, challenge_zone, mock_challenge_zone_record):
+    # init
+    resolver = StubCnameResolver({'_acme-challenge.www.example.com': f'{mock_challenge_zone_record}.'})
+    client = _GCoreClient(token='test', challenge_zone=challenge_zone, resolver=resolver)
+    record_name = '_acme-challenge.www.example.com'
+
+    # act
+    client.add_txt_record('www.example.com', record_name, record_payload['record_content'], 300)
+    client.del_txt_record('www.example.com', record_name)
+
+    # check: one lookup of the challenge zone, TXT written there, CNAME resolved once
+    assert [call.request.method for call in responses.calls] == ['GET', 'POST', 'GET', 'DELETE']
+    assert all(f'/{challenge_zone}/{mock_challenge_zone_record}/TXT' in call.request.url for call in responses.calls[1:])
+    assert resolver.lookups == [record_name]
+
+
+def test_challenge_zone_rejects_foreign_cname(challenge_zone):
+    # init
+    resolver = StubCnameResolver({'_acme-challenge.example.com': 'example.com.elsewhere.org'})
+    client = _GCoreClient(token='test', challenge_zone=challenge_zone, resolver=resolver)
+
+    # check
+    with pytest.raises(errors.PluginError):
+        client.add_txt_record('example.com', '_acme-challenge.example.com', 'text', 300)
+
+
+@responses.activate
+def test_follow_cnames_without_cname(record_payload, mock_auth, mock_get_zones, mock_post_record):
+    # init
+    resolver = StubCnameResolver({})
+
+    # act
+    _GCoreClient(token='test', resolver=resolver).add_txt_record(**record_payload)
+
+    # check: falls back to the record name itself
+    assert resolver.lookups == [record_payload['record_name']]
+    assert responses.calls[-1].request.url.endswith(f'/{record_payload["domain"]}/{record_payload["record_name"]}/TXT')
+
+
+@responses.activate
+def test_api_cname_resolver(record_payload, mock_get_zones, challenge_zone):
+    # init
+    responses.add(
+        responses.GET,
+        f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{record_payload["domain"]}/'
+        f'{record_payload["record_name"]}/CNAME',
+        json={'resource_records': [{'content': [f'example.com.{challenge_zone}.'], 'enabled': True}], 'ttl': 300},
+        status=200
+    )
+    client = _GCoreClient(token='test', follow_cnames=True)
+
+    # act # check
+    assert client.resolver.resolve(record_payload['record_name']) == f'example.com.{challenge_zone}'
+    assert client.resolver.resolve(record_payload['record_name']) == f'example.com.{challenge_zone}'
+    assert len([call for call in responses.calls if call.request.url.endswith('/CNAME')]) == 1
+
+
+@responses.activate
+def test_del_txt_record_keeps_other_values(record_payload, mock_get_zones, rrset_exists_two_records):
+    # init
+    url = f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{record_payload["domain"]}/{record_payload["record_name"]}/TXT'
+    responses.add(responses.GET, url, json=json.loads(rrset_exists_two_records), status=200)
+    responses.add(responses.PUT, url, json={}, status=200)
+
+    # act
+    _GCoreClient(token='test').del_txt_record(
+        record_payload['domain'], record_payload['record_name'], record_payload['record_content'],
+    )
+
+    # check: only this run's value removed
+    assert json.loads(responses.calls[-1].request.body) == {
+        'resource_records': [{'content': ['coexisting content'], 'enabled': True}], 'ttl': 300,
+    }
+
+
+@responses.activate
+def test_del_txt_record_deletes_empty_rrset(record_payload, mock_get_zones, mock_del_record):
+    # init
+    url = f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{record_payload["domain"]}/{record_payload["record_name"]}/TXT'
+    responses.add(responses.GET, url, json=_GCoreClient._data_for_txt(300, [record_payload['record_content']]))
+
+    # act
+    _GCoreClient(token='test').del_txt_record(
+        record_payload['domain'], record_payload['record_name'], record_payload['record_content'],
+    )
+
+    # check
+    assert responses.calls[-1].request.method == 'DELETE'
+
+
+@responses.activate
+def test_del_txt_record_retries_on_conflict(record_payload, mock_get_zones, rrset_exists_two_records, monkeypatch):
+    # init
+    monkeypatch.setattr(_GCoreClient, 'retry_delay', 0)
+    url = f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{record_payload["domain"]}/{record_payload["record_name"]}/TXT'
+    concurrent = json.loads(rrset_exists_two_records)
+    concurrent['resource_records'].append({'content': ['concurrent content'], 'enabled': True})
+    responses.add(responses.GET, url, json=json.loads(rrset_exists_two_records), status=200)
+    responses.add(responses.PUT, url, json={}, status=409)
+    responses.add(responses.GET, url, json=concurrent, status=200)
+    responses.add(responses.PUT, url, json={}, status=200)
+
+    # act
+    _GCoreClient(token='test').del_txt_record(
+        record_payload['domain'], record_payload['record_name'], record_payload['record_content'],
+    )
+
+    # check: second write is based on the fresh read
+    assert [call.request.method for call in responses.calls] == ['GET', 'GET', 'PUT', 'GET', 'PUT']
+    assert _GCoreClient._txt_contents(json.loads(responses.calls[-1].request.body)) == [
+        'coexisting content', 'concurrent content',
+    ]
+
+
+@responses.activate
+def test_add_txt_record_with_lock_dir(record_payload, mock_get_zones, mock_post_record, tmp_path):
+    # init
+    url = f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{record_payload["domain"]}/{record_payload["record_name"]}/TXT'
+    responses.add(responses.GET, url, json={}, status=404)
+
+    # act
+    _GCoreClient(token='test', lock_dir=str(tmp_path)).add_txt_record(**record_payload)
+
+    # check: rrset read under the lock, then created without a conflict round trip
+    assert [call.request.method for call in responses.calls] == ['GET', 'GET', 'POST']
+    assert json.loads(responses.calls[-1].request.body) == _GCoreClient._data_for_txt(300, ['123456790'])
+
+
+@responses.activate
+def test_apply_txt_changes_retries_on_conflict(record_payload, rrset_exists_two_records, monkeypatch):
+    # init
+    monkeypatch.setattr(_GCoreClient, 'retry_delay', 0)
+    url = f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{record_payload["domain"]}/{record_payload["record_name"]}/TXT'
+    responses.add(responses.GET, url, json={}, status=404)
+    responses.add(responses.POST, url, json={}, status=409)
+    responses.add(responses.GET, url, json=json.loads(rrset_exists_two_records), status=200)
+    responses.add(responses.PUT, url, json={}, status=200)
+
+    # act
+    _GCoreClient(token='test')._apply_txt_changes(
+        record_payload['domain'], record_payload['record_name'],
+        [{'op': 'add', 'content': 'text', 'ttl': 300}, {'op': 'remove', 'content': '123456790'}],
+    )
+
+    # check
+    assert [call.request.method for call in responses.calls] == ['GET', 'POST', 'GET', 'PUT']
+    assert _GCoreClient._txt_contents(json.loads(responses.calls[-1].request.body)) == ['coexisting content', 'text']
+
+
+def test_trace_dumps_are_appended(tmp_path):
+    # init
+    trace_file = str(tmp_path / 'trace.json')
+    first, second = Tracer(), Tracer()
+    with first.span('first'):
+        pass
+    with second.span('second'):
+        pass
+
+    # act
+    first.dump(trace_file)
+    first.dump(trace_file)
+    second.dump(trace_file)
+
+    # check: each span written once, later runs after earlier ones
+    events = load_events(trace_file)
+    assert [event['name'] for event in events] == ['first', 'second']
+    assert events[0]['ts'] <= events[1]['ts']
+
+
+@responses.activate
+def test_prepare_failure_writes_trace(authenticator_config, tmp_path, monkeypatch):
+    # init
+    trace_file = str(tmp_path / 'trace.json')
+    authenticator_config.dns_gcore_trace_file = trace_file
+    authenticator_config.dns_gcore_preflight = True
+    responses.add(responses.GET, f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}', json={'zones': []})
+
+    # act
+    with pytest.raises(errors.PluginError):
+        Authenticator(authenticator_config, 'dns-gcore').prepare()
+
+    # check
+    events = {event['name']: event for event in load_events(trace_file)}
+    assert events['Authenticator.preflight']['args']['error'] == 'PluginError'
+    assert events['GCoreClient._request']['args']['status'] == 200
+
+
+@responses.activate
+def test_prepare_preflight_login_failure(authenticator, authenticator_config, tmp_path):
+    # init
+    credentials = tmp_path / 'login.ini'
+    credentials.write_text('dns_gcore_email = user@example.com\ndns_gcore_password = secret\n')
+    credentials.chmod(0o600)
+    authenticator_config.dns_gcore_credentials = str(credentials)
+    authenticator_config.dns_gcore_preflight = True
+    responses.add(responses.POST, f'{GCoreClient._auth_url}/auth/jwt/login', json={}, status=401)
+
+    # act # check
+    with pytest.raises(errors.PluginError, match='authentication failed'):
+        authenticator.prepare()
+
+
+@responses.activate
+def test_prepare_preflight_warms_client(authenticator, authenticator_config, tmp_path, record_payload,
+                                        mock_auth, mock_get_zones, mock_post_record):
+    # init
+    credentials = tmp_path / 'login.ini'
+    credentials.write_text('dns_gcore_email = user@example.com\ndns_gcore_password = secret\n')
+    credentials.chmod(0o600)
+    authenticator_config.dns_gcore_credentials = str(credentials)
+    authenticator_config.dns_gcore_preflight = True
+    authenticator_config.domains = ['example.com', '*.example.com']
+    url = f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{record_payload["domain"]}/{record_payload["record_name"]}/TXT'
+    responses.add(responses.GET, url, json=_GCoreClient._data_for_txt(300, [record_payload['record_content']]))
+    responses.add(responses.DELETE, url, json={})
+    achalls = [make_achall('example.com')]
+
+    # act
+    authenticator.prepare()
+    authenticator.perform(achalls)
+    authenticator.cleanup(achalls)
+
+    # check: one login and one zone lookup for the whole run
+    assert [(call.request.method, call.request.url.split('?')[0].rsplit('/', 1)[-1]) for call in responses.calls] == [
+        ('POST', 'login'), ('GET', 'zones'), ('POST', 'TXT'), ('GET', 'TXT'), ('DELETE', 'TXT'),
+    ]
+
+
+def test_challenge_zone_requires_cname(challenge_zone):
+    # init
+    client = _GCoreClient(token='test', challenge_zone=challenge_zone, resolver=StubCnameResolver({}))
+
+    # check: never falls back to writing into the domain's own zone
+    with pytest.raises(errors.PluginError, match='No CNAME found for _acme-challenge.example.com'):
+        client.add_txt_record('example.com', '_acme-challenge.example.com', 'text', 300)
+
+
+@responses.activate
+def test_api_cname_resolver_forbidden(record_payload, challenge_zone):
+    # init
+    responses.add(responses.GET, f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}', json={}, status=403)
+    client = _GCoreClient(token='test', challenge_zone=challenge_zone)
+
+    # act # check
+    with pytest.raises(errors.PluginError, match='read access'):
+        client.add_txt_record(**record_payload)
+
+
+@responses.activate
+def test_assume_cnames(record_payload, challenge_zone, mock_challenge_zone_record):
+    # init
+    client = _GCoreClient(token='test', challenge_zone=challenge_zone, assume_cnames=True)
+
+    # act
+    client.add_txt_record('www.example.com', '_acme-challenge.www.example.com', record_payload['record_content'], 300)
+
+    # check: no lookup outside of the challenge zone
+    assert [call.request.method for call in responses.calls] == ['GET', 'POST']
+    assert 'name=example.net' in responses.calls[0].request.url
+    assert f'/{challenge_zone}/{mock_challenge_zone_record}/TXT' in responses.calls[1].request.url
+
+
+def test_assume_cnames_requires_challenge_zone():
+    # check
+    with pytest.raises(errors.PluginError):
+        _GCoreClient(token='test', assume_cnames=True)
+
+
+def test_adaptive_propagation(authenticator, authenticator_config, monkeypatch):
+    # init
+    authenticator_config.dns_gcore_adaptive_propagation = True
+    stats = PropagationStats.from_work_dir(authenticator_config.work_dir)
+    stats.record('example.com', 60, True, observed=10)
+    stats.record('example.org', 40, True)
+    stats.save()
+    observe = mock.MagicMock(return_value={'example.com': 3.2})
+    monkeypatch.setattr(TxtObserver, 'observe', observe)
+    client = mock.MagicMock()
+    client.challenge_target.side_effect = lambda domain, record_name: (domain.split('.', 1)[-1], record_name)
+    authenticator._client = client
+    authenticator.credentials = mock.MagicMock()
+    authenticator._setup_credentials = mock.MagicMock()
+    achalls = [make_achall('www.example.com'), make_achall('www.example.org'), make_achall('api.example.org')]
+
+    # act
+    authenticator.perform(achalls)
+    hint = authenticator.auth_hint(achalls[2:])
+    authenticator.cleanup(achalls)
+
+    # check: longest learned wait of all zones, observed records per zone, failures recorded per zone
+    assert authenticator._waited == 40
+    assert 'waited only 40 seconds' in hint
+    records, seconds = observe.call_args[0]
+    assert seconds == 40
+    assert sorted(records) == ['example.com', 'example.org']
+    assert [name for name, _ in records['example.org']] == ['_acme-challenge.www.example.org',
+                                                             '_acme-challenge.api.example.org']
+    zones = PropagationStats.from_work_dir(authenticator_config.work_dir).zones
+    assert zones['example.com']['samples'][-1]['seconds'] == 40
+    assert zones['example.com']['samples'][-1]['observed'] == 3.2
+    assert len(zones['example.org']['samples']) == 1
+    assert zones['example.org']['failures'][-1]['seconds'] == 40
+
+
+@pytest.mark.parametrize('failed, expected', (
+    ([], {}),
+    (['www.example.org'], {'example.org': ([], [60])}),
+))
+def test_adaptive_propagation_aborted(authenticator, authenticator_config, failed, expected):
+    # init
+    authenticator_config.dns_gcore_adaptive_propagation = True
+    client = mock.MagicMock()
+    client.challenge_target.side_effect = lambda domain, record_name: (domain.split('.', 1)[-1], record_name)
+    authenticator._client = client
+    authenticator.credentials = mock.MagicMock()
+    authenticator._setup_credentials = mock.MagicMock()
+    achalls = [make_achall('www.example.com'), make_achall('www.example.org')]
+
+    # act: polling the authorizations fails, as after a timeout or network error
+    authenticator.perform(achalls)
+    if failed:
+        authenticator.auth_hint([make_achall(domain) for domain in failed])
+    try:
+        raise errors.AuthorizationError('Some challenges have failed.')
+    except errors.AuthorizationError:
+        authenticator.cleanup(achalls)
+
+    # check: no success recorded, failures reported by the CA still are
+    zones = PropagationStats.from_work_dir(authenticator_config.work_dir).zones
+    assert {
+        zone_name: ([sample['seconds'] for sample in zone.get('samples', [])],
+                    [failure['seconds'] for failure in zone.get('failures', [])])
+        for zone_name, zone in zones.items()
+    } == expected
+
+
+def test_adaptive_propagation_disabled(authenticator, authenticator_config):
+    # init
+    client = mock.MagicMock()
+    client.challenge_target.return_value = ('example.com', '_acme-challenge.example.com')
+    authenticator._client = client
+    authenticator.credentials = mock.MagicMock()
+    authenticator._setup_credentials = mock.MagicMock()
+    achalls = [make_achall('example.com')]
+
+    # act
+    authenticator.perform(achalls)
+    hint = authenticator.auth_hint(achalls)
+    authenticator.cleanup(achalls)
+
+    # check
+    assert authenticator._waited == 60
+    assert 'waited only' not in hint
+    assert PropagationStats.from_work_dir(authenticator_config.work_dir).zones == {}
+
+
+def test_endpoint_id_separates_accounts():
+    # init
+    default = _GCoreClient(token='123').gcore.endpoint_id
+
+    # check
+    assert _GCoreClient(token='123').gcore.endpoint_id == default
+    assert _GCoreClient(token='456').gcore.endpoint_id != default
+    assert _GCoreClient(token='123', dns_api_url='https://dns.example.com').gcore.endpoint_id != default
+
+
+@responses.activate
+def test_del_txt_record_with_lock_dir(record_payload, mock_get_zones, rrset_exists_two_records, tmp_path):
+    # init
+    url = f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}/{record_payload["domain"]}/{record_payload["record_name"]}/TXT'
+    responses.add(responses.GET, url, json=json.loads(rrset_exists_two_records), status=200)
+    responses.add(responses.PUT, url, json={}, status=200)
+    client = _GCoreClient(token='test', lock_dir=str(tmp_path))
+
+    # act
+    client.del_txt_record(record_payload['domain'], record_payload['record_name'], record_payload['record_content'])
+
+    # check: zone lookup, then a single read under the lock
+    assert [call.request.method for call in responses.calls] == ['GET', 'GET', 'PUT']
+    assert list(tmp_path.glob(f'{client.gcore.endpoint_id}_*.lock'))
+
+
+@responses.activate
+def test_unwritable_trace_file_does_not_break_issuance(authenticator, authenticator_config, tmp_path):
+    # init
+    authenticator_config.dns_gcore_trace_file = str(tmp_path / 'missing' / 'trace.json')
+    authenticator_config.dns_gcore_preflight = True
+    responses.add(responses.GET, f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}', json={'zones': []})
+    authenticator._attempt_cleanup = False
+
+    # act # check: the preflight error is kept, cleanup does not raise
+    with pytest.raises(errors.PluginError):
+        authenticator.prepare()
+    authenticator.cleanup([make_achall('example.com')])
+
+
+@responses.activate
+def test_preflight_problems_logged_through_plugin_entry_point(authenticator_config, mock_get_zones, caplog):
+    # init
+    authenticator_config.dns_gcore_preflight = True
+    authenticator_config.domains = ['example.com', 'a.example.org', 'b.example.org']
+    responses.add(
+        responses.GET,
+        f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}',
+        match=[responses.matchers.query_param_matcher({'limit': '100', 'name': 'example.org'})],
+        json={'zones': []},
+    )
+    plugin = disco.PluginEntryPoint(importlib.metadata.EntryPoint(
+        name='dns-gcore', value='certbot_dns_gcore.dns_gcore:Authenticator', group='certbot.plugins',
+    ))
+    plugin.init(authenticator_config)
+
+    # act
+    with caplog.at_level(logging.ERROR, logger='certbot_dns_gcore'):
+        result = plugin.prepare()
+
+    # check: certbot swallows the error, the problems are still readable one per line
+    assert isinstance(result, errors.PluginError)
+    assert plugin.misconfigured is False and plugin.available is False
+    problems = [record.getMessage() for record in caplog.records if record.levelno == logging.ERROR]
+    assert len(problems) == 2
+    assert problems[0].startswith('G-Core preflight check failed for a.example.org: Unable to determine zone name')
+    assert problems[1].startswith('G-Core preflight check failed for b.example.org')
+
+
+@responses.activate
+def test_preflight_checks_challenge_zone(challenge_zone, mock_get_challenge_zone):
+    # init
+    client = _GCoreClient(token='test', challenge_zone=challenge_zone, assume_cnames=True)
+
+    # act
+    zones = client.preflight(['example.com', 'www.example.com'])
+
+    # check: the challenge zone is looked up once for all domains
+    assert zones == {'example.com': challenge_zone, 'www.example.com': challenge_zone}
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+@pytest.mark.parametrize('status, zones', ((401, {}), (200, {'zones': []})))
+def test_preflight_rejects_bad_token_or_challenge_zone(challenge_zone, status, zones):
+    # init
+    responses.add(responses.GET, f'{GCoreClient._dns_api_url}/{GCoreClient._root_zones}', json=zones, status=status)
+    client = _GCoreClient(token='bad', challenge_zone=challenge_zone, assume_cnames=True)
+
+    # act # check
+    with pytest.raises(errors.PluginError, match='example.com'):
+        client.preflight(['example.com'])
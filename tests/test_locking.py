@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from certbot_dns_gcore.locking import RrsetCoordinator
+
+KEY = ('example.com', '_acme-challenge.example.com', 'TXT')
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    return RrsetCoordinator(str(tmp_path))
+
+
+def test_submit_applies_own_changes(coordinator):
+    # init
+    batches = []
+
+    # act
+    coordinator.submit(KEY, [{'op': 'add', 'content': 'text'}], batches.append)
+
+    # check
+    assert [[change['content'] for change in batch] for batch in batches] == [['text']]
+
+
+def test_concurrent_writers_are_merged(coordinator):
+    # init
+    batches = []
+    barrier = threading.Barrier(8)
+
+    def apply(batch):
+        time.sleep(0.05)
+        batches.append(batch)
+
+    def writer(index):
+        barrier.wait()
+        coordinator.submit(KEY, [{'op': 'add', 'content': f'text{index}'}], apply)
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(8)]
+
+    # act
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # check: every change applied exactly once, with fewer writes than writers
+    applied = [change['content'] for batch in batches for change in batch]
+    assert sorted(applied) == sorted(f'text{index}' for index in range(8))
+    assert len(batches) < 8
+
+
+def test_failed_apply_requeues_other_writers(coordinator, tmp_path):
+    # init
+    queue_path = str(tmp_path / '_'.join(KEY)) + '.queue'
+    RrsetCoordinator._append(queue_path, [{'op': 'add', 'content': 'other', 'id': 'other'}])
+
+    def apply(batch):
+        raise RuntimeError('API down')
+
+    # act
+    with pytest.raises(RuntimeError):
+        coordinator.submit(KEY, [{'op': 'add', 'content': 'own'}], apply)
+
+    # check
+    assert [change['content'] for change in RrsetCoordinator._drain(queue_path)] == ['other']
+
+
+def test_changes_lost_by_interrupted_writer_are_applied(coordinator, monkeypatch):
+    # init: a holder drained the queue and died before writing
+    batches = []
+    monkeypatch.setattr(RrsetCoordinator, '_drain', staticmethod(lambda path: []))
+
+    # act
+    coordinator.submit(KEY, [{'op': 'add', 'content': 'text'}], batches.append)
+
+    # check
+    assert [[change['content'] for change in batch] for batch in batches] == [['text']]
+
+
+def test_changes_applied_by_other_writer_are_done(coordinator, tmp_path, monkeypatch):
+    # init: another holder drained and applied our change
+    drain = RrsetCoordinator._drain
+    done_path = str(tmp_path / '_'.join(KEY)) + '.done'
+
+    def drained_by_other(path):
+        changes = drain(path)
+        if path.endswith('.queue'):
+            RrsetCoordinator._append(done_path, [{'id': change['id']} for change in changes])
+            return []
+        return changes
+
+    monkeypatch.setattr(RrsetCoordinator, '_drain', staticmethod(drained_by_other))
+
+    # act
+    coordinator.submit(KEY, [{'op': 'add', 'content': 'text'}], pytest.fail)
+
+    # check: nothing applied twice, done entry consumed
+    monkeypatch.setattr(RrsetCoordinator, '_drain', staticmethod(drain))
+    assert RrsetCoordinator._drain(done_path) == []
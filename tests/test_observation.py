@@ -0,0 +1,108 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from certbot_dns_gcore.observation import TxtObserver
+from certbot_dns_gcore.observation import query_txt
+
+
+class FakeNameserver:
+    """Authoritative UDP nameserver answering TXT queries from ``records``."""
+
+    def __init__(self):
+        self.records = {}
+        self.queries = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.address = self.sock.getsockname()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                query, client = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            end = query.index(b'\0', 12) + 5
+            labels, offset = [], 12
+            while query[offset]:
+                labels.append(query[offset + 1:offset + 1 + query[offset]].decode())
+                offset += 1 + query[offset]
+            name = '.'.join(labels)
+            self.queries.append((name, query[2:4]))
+            values = self.records.get(name)
+            header = struct.pack('!HHHHHH', struct.unpack('!H', query[:2])[0],
+                                 0x8400 if values is not None else 0x8403, 1, len(values or []), 0, 0)
+            answers = b''.join(
+                b'\xc0\x0c' + struct.pack('!HHIH', 16, 1, 60, len(value) + 1) + bytes([len(value)]) + value.encode()
+                for value in values or []
+            )
+            self.sock.sendto(header + query[12:end] + answers, client)
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def nameserver():
+    server = FakeNameserver()
+    yield server
+    server.close()
+
+
+def test_query_txt(nameserver):
+    # init
+    nameserver.records['_acme-challenge.example.com'] = ['first', 'second']
+
+    # act
+    values = query_txt(nameserver.address, '_acme-challenge.example.com', 1)
+
+    # check: non-recursive query
+    assert values == ['first', 'second']
+    assert nameserver.queries == [('_acme-challenge.example.com', b'\0\0')]
+
+
+def test_query_txt_nxdomain(nameserver):
+    # act # check
+    assert query_txt(nameserver.address, '_acme-challenge.example.com', 1) == []
+
+
+def test_observe(nameserver, monkeypatch):
+    # init: the record is served from the second poll on
+    monkeypatch.setattr(TxtObserver, 'interval', 0.01)
+    observer = TxtObserver(['{}:{}'.format(*nameserver.address)])
+    polls = []
+
+    def publish(seconds):
+        polls.append(seconds)
+        nameserver.records['_acme-challenge.example.com'] = ['token']
+    monkeypatch.setattr('certbot_dns_gcore.observation.time.sleep', publish)
+
+    # act
+    observed = observer.observe({'example.com': [('_acme-challenge.example.com', 'token')]}, 5)
+
+    # check
+    assert list(observed) == ['example.com']
+    assert 0 < observed['example.com'] < 5
+    assert len(polls) == 1
+
+
+def test_observe_until_deadline(nameserver, monkeypatch):
+    # init
+    monkeypatch.setattr(TxtObserver, 'interval', 0.01)
+    nameserver.records['_acme-challenge.example.com'] = ['stale']
+    observer = TxtObserver(['{}:{}'.format(*nameserver.address)])
+
+    # act
+    observed = observer.observe({'example.com': [('_acme-challenge.example.com', 'token')]}, 0.1)
+
+    # check
+    assert observed == {}
+    assert len(nameserver.queries) > 1
+
+
+def test_observe_without_nameservers():
+    # act # check
+    assert TxtObserver([]).observe({'example.com': [('_acme-challenge.example.com', 'token')]}, 5) == {}
@@ -0,0 +1,150 @@
+import pytest
+
+from certbot_dns_gcore.propagation import PropagationStats
+from certbot_dns_gcore.propagation import main
+
+
+@pytest.fixture
+def stats(tmp_path):
+    return PropagationStats.from_work_dir(str(tmp_path))
+
+
+def test_wait_without_history(stats):
+    # check
+    assert stats.wait('example.com', 60) == 60
+
+
+def test_wait_keeps_proven_wait(stats):
+    # init
+    stats.record('example.com', 60, True)
+
+    # check
+    assert stats.wait('example.com', 60) == 60
+    assert stats.wait('example.com', 30) == 30
+    assert stats.wait('example.org', 60) == 60
+
+
+def test_wait_shrinks_to_observation(stats):
+    # init
+    stats.record('example.com', 60, True, observed=3.4)
+
+    # check: observed seconds rounded up plus the margin
+    assert stats.wait('example.com', 60) == 4 + PropagationStats.margin
+
+
+@pytest.mark.parametrize('slow, expected', ((1, 10), (2, 35)))
+def test_wait_is_percentile_of_needed(stats, slow, expected):
+    # init
+    for _ in range(10 - slow):
+        stats.record('example.com', 60, True, observed=5)
+    for _ in range(slow):
+        stats.record('example.com', 60, True, observed=30)
+
+    # check
+    assert stats.wait('example.com', 60) == expected
+
+
+def test_wait_above_failure(stats):
+    # init
+    stats.record('example.com', 30, True)
+    stats.record('example.com', 60, True, observed=5)
+    stats.record('example.com', 10, False)
+
+    # check: the smallest successful wait above the failed one
+    assert stats.wait('example.com', 80) == 30
+
+
+def test_wait_without_success_above_failure(stats):
+    # init
+    stats.record('example.com', 60, True)
+    stats.record('example.com', 60, False)
+
+    # check
+    assert stats.wait('example.com', 80) == 80
+
+
+def test_failure_expires(stats):
+    # init
+    stats.record('example.com', 60, True, observed=5)
+    stats.record('example.com', 10, False)
+    stats.zones['example.com']['failures'][0]['time'] -= PropagationStats.failure_ttl + 1
+
+    # check
+    assert stats.wait('example.com', 80) == 10
+
+
+def test_failure_outlives_history(stats):
+    # init
+    stats.record('example.com', 10, False)
+    for _ in range(PropagationStats.history):
+        stats.record('example.com', 60, True, observed=5)
+    stats.save()
+
+    # check
+    assert PropagationStats(stats.path).wait('example.com', 80) == 60
+
+
+@pytest.mark.parametrize('observable, expected', ((True, 17), (False, 80)))
+def test_wait_converges_without_failures(tmp_path, observable, expected):
+    # init: the records are served after 12 seconds
+    waits = []
+
+    # act
+    for _ in range(50):
+        stats = PropagationStats.from_work_dir(str(tmp_path))
+        seconds = stats.wait('example.com', 80)
+        waits.append(seconds)
+        stats.record('example.com', seconds, seconds >= 12, observed=12.0 if observable else None)
+        stats.save()
+
+    # check
+    assert min(waits) >= 12
+    assert waits[-1] == expected
+
+
+def test_save_merges_concurrent_runs(stats):
+    # init
+    other = PropagationStats(stats.path)
+    stats.record('example.com', 60, True)
+    other.record('example.org', 30, True)
+
+    # act
+    stats.save()
+    other.save()
+
+    # check
+    assert sorted(PropagationStats(stats.path).zones) == ['example.com', 'example.org']
+
+
+def test_history_is_bounded(stats):
+    # act
+    for seconds in range(PropagationStats.history + 5):
+        stats.record('example.com', seconds, True)
+    stats.save()
+
+    # check
+    assert len(PropagationStats(stats.path).zones['example.com']['samples']) == PropagationStats.history
+
+
+def test_failures_are_kept_apart(stats):
+    # act
+    stats.record('example.com', 60, True)
+    stats.record('example.com', 30, False)
+    stats.save()
+
+    # check
+    zone = PropagationStats(stats.path).zones['example.com']
+    assert [sample['seconds'] for sample in zone['samples']] == [60]
+    assert [failure['seconds'] for failure in zone['failures']] == [30]
+
+
+def test_report(stats, tmp_path, capsys):
+    # init
+    stats.record('example.com', 60, True, observed=3)
+    stats.save()
+
+    # act
+    assert main(['--work-dir', str(tmp_path), '--propagation-seconds', '60']) == 0
+
+    # check
+    assert capsys.readouterr().out.splitlines()[1].split() == ['example.com', '1', '8', '0', '8']